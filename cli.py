@@ -1,4 +1,4 @@
-from scraper import scrape_community_posts, save_posts
+from scraper import scrape_community_posts, save_posts_streaming
 from pathlib import Path
 import argparse
 
@@ -9,21 +9,25 @@ def main():
                       help='Number of posts to scrape (default: all)')
     parser.add_argument('-o', '--output', type=Path, default=Path.cwd(),
                       help='Output directory (default: current directory)')
+    parser.add_argument('--resume', action='store_true',
+                      help='Skip posts saved by previous --resume runs, continuing where the last one stopped')
     
     args = parser.parse_args()
+    writer = None
     
     try:
-        # Scrape posts
-        posts = scrape_community_posts(args.channel_id, args.num_posts)
+        # Scrape posts, saving each one as it is extracted
+        with save_posts_streaming(args.channel_id, args.output) as writer:
+            scrape_community_posts(args.channel_id, args.num_posts, on_post=writer.append,
+                                   resume=args.resume)
         
-        # Save posts
-        output_file = save_posts(posts, args.channel_id, args.output)
-        
-        print(f"\nSuccessfully scraped {len(posts)} posts")
-        print(f"Results saved to: {output_file}")
+        print(f"\nSuccessfully scraped {writer.count} posts")
+        print(f"Results saved to: {writer.path}")
         
     except Exception as e:
         print(f"Error: {str(e)}")
+        if writer and writer.count:
+            print(f"Partial results ({writer.count} posts) saved to: {writer.path}")
         return 1
     
     return 0
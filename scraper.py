@@ -1,12 +1,41 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Union, Any
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple, Union, Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CURSOR_DIR = Path.home() / '.cache' / 'yt-community'
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize an object to indented UTF-8 JSON."""
+    if orjson:
+        # orjson emits UTF-8 bytes directly, skipping the str encode pass
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+def _dig(obj: Any, *keys: Union[str, int], default: Any = None) -> Any:
+    """Follow a path of dict keys and list indexes, returning default if any step is missing."""
+    try:
+        for key in keys:
+            obj = obj[key]
+    except (KeyError, IndexError, TypeError):
+        return default
+    return obj
 
 class YouTubeCommunityAPI:
     def __init__(self):
         self.base_url = "https://www.youtube.com/youtubei/v1/browse"
+        self.timeout = 30.0
         self.headers = {
             "Content-Type": "application/json",
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
@@ -19,11 +48,45 @@ class YouTubeCommunityAPI:
             }
         }
 
+        # Continuation requests only differ by token, so one payload is reused for all of them
+        self._continuation_payload = {
+            "context": self.client_context,
+            "continuation": None
+        }
+
+        # Reuse one pooled keep-alive connection across initial and continuation requests
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        retries = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'POST'})
+        )
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries))
+
+    def __enter__(self) -> 'YouTubeCommunityAPI':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the underlying HTTP session."""
+        self.session.close()
+
     def _make_request(self, payload: Dict) -> Dict:
         """Make a POST request to YouTube API."""
         try:
-            response = requests.post(self.base_url, json=payload, headers=self.headers)
+            if orjson:
+                # Content-Type is already set in the session headers
+                response = self.session.post(self.base_url, data=orjson.dumps(payload),
+                                             timeout=self.timeout)
+            else:
+                response = self.session.post(self.base_url, json=payload, timeout=self.timeout)
             response.raise_for_status()
+            if orjson:
+                return orjson.loads(response.content)
             return response.json()
         except Exception as e:
             raise Exception(f"API request failed: {str(e)}")
@@ -39,18 +102,16 @@ class YouTubeCommunityAPI:
 
     def get_continuation_data(self, continuation_token: str) -> Dict:
         """Get next batch of posts using continuation token."""
-        payload = {
-            "context": self.client_context,
-            "continuation": continuation_token
-        }
-        return self._make_request(payload)
+        self._continuation_payload["continuation"] = continuation_token
+        return self._make_request(self._continuation_payload)
 
-class PostExtractor:
-    @staticmethod
-    def extract_text_content(content_runs: List[Dict]) -> str:
-        """Extract text content from runs format."""
-        return ''.join(run.get('text', '') for run in content_runs)
+    def get_continuation_items(self, continuation_token: str) -> List[Dict]:
+        """Get only the items of the next batch, dropping the rest of the response."""
+        response = self.get_continuation_data(continuation_token)
+        return response['onResponseReceivedEndpoints'][0]['appendContinuationItemsAction']\
+            ['continuationItems']
 
+class PostExtractor:
     @staticmethod
     def extract_post_data(post_renderer: Dict) -> Dict:
         """Extract relevant data from a post renderer."""
@@ -64,146 +125,343 @@ class PostExtractor:
             'links': []
         }
 
-        # Extract content text
+        # Extract content text and links in a single pass over the runs
         content_text = post_renderer.get('contentText', {})
         if 'runs' in content_text:
-            post_data['content'] = PostExtractor.extract_text_content(content_text['runs'])
-            
-            # Extract links
+            parts = []
             for run in content_text['runs']:
+                text = run.get('text', '')
+                parts.append(text)
+
                 if 'navigationEndpoint' in run:
-                    url = run.get('navigationEndpoint', {}).get('commandMetadata', {}).get(
-                        'webCommandMetadata', {}).get('url', '')
+                    url = _dig(run, 'navigationEndpoint', 'commandMetadata', 'webCommandMetadata', 'url',
+                               default='')
                     if url:
                         if url.startswith('/'):
                             url = f'https://www.youtube.com{url}'
                         post_data['links'].append({
-                            'text': run.get('text', ''),
+                            'text': text,
                             'url': url
                         })
+            post_data['content'] = ''.join(parts)
 
         # Extract timestamp
-        timestamp = post_renderer.get('publishedTimeText', {}).get('runs', [{}])[0].get('text', '')
+        timestamp = _dig(post_renderer, 'publishedTimeText', 'runs', 0, 'text', default='')
         post_data['timestamp'] = timestamp
 
         # Extract likes
-        vote_count = post_renderer.get('voteCount', {}).get('simpleText', '0')
+        vote_count = _dig(post_renderer, 'voteCount', 'simpleText', default='0')
         post_data['likes'] = vote_count
 
         # Extract comments count
-        comment_count = post_renderer.get('actionButtons', {}).get('commentActionButtonsRenderer', {})\
-            .get('replyButton', {}).get('buttonRenderer', {}).get('text', {}).get('simpleText', '0')
+        comment_count = _dig(post_renderer, 'actionButtons', 'commentActionButtonsRenderer', 'replyButton',
+                             'buttonRenderer', 'text', 'simpleText', default='0')
         post_data['comments_count'] = comment_count.split()[0] if comment_count else '0'
 
         # Extract images
-        attachment = post_renderer.get('backstageAttachment', {})
-        if 'backstageImageRenderer' in attachment:
-            thumbnails = attachment['backstageImageRenderer']['image']['thumbnails']
-            if thumbnails:
-                # Get standard quality (usually the first one)
-                standard_url = thumbnails[0]['url']
-                
-                # Get high quality by modifying the URL
-                high_res_url = standard_url.split('=')[0] + '=s2160'
-                
-                post_data['images'].append({
-                    'standard': standard_url,
-                    'high_res': high_res_url
-                })
+        thumbnails = _dig(post_renderer, 'backstageAttachment', 'backstageImageRenderer', 'image', 'thumbnails')
+        if thumbnails:
+            # Get standard quality (usually the first one)
+            standard_url = thumbnails[0]['url']
+            
+            # Get high quality by replacing the size parameters after the first '='
+            size_index = standard_url.find('=')
+            high_res_url = (standard_url[:size_index] if size_index != -1 else standard_url) + '=s2160'
+            
+            post_data['images'].append({
+                'standard': standard_url,
+                'high_res': high_res_url
+            })
 
         return post_data
 
-def scrape_community_posts(channel_id: str, max_posts: int = float('inf')) -> List[Dict]:
-    """Scrape community posts from a YouTube channel."""
-    api = YouTubeCommunityAPI()
-    posts = []
-    
-    # Get initial data
-    response = api.get_initial_data(channel_id)
-    
-    try:
-        # Find the Community tab
-        tabs = response['contents']['twoColumnBrowseResultsRenderer']['tabs']
-        community_tab = None
-        for tab in tabs:
-            if 'tabRenderer' in tab and \
-               tab['tabRenderer'].get('title', '').lower() == 'community':
-                community_tab = tab['tabRenderer']
-                break
-        
-        if not community_tab:
-            raise Exception("Community tab not found")
-        
-        # Extract initial posts
-        contents = community_tab['content']['sectionListRenderer']['contents'][0]\
-            ['itemSectionRenderer']['contents']
-        
-        # Get continuation token
+class _Prefetch:
+    """Run a call on a daemon thread and hand its result back when asked.
+
+    A daemon thread is used so that an error or Ctrl-C never waits for an
+    in-flight request to finish, neither on the way out nor at interpreter exit.
+    An abandoned request may still be running after the API session is closed;
+    it then fails or completes on its own thread and the outcome is discarded.
+    """
+
+    def __init__(self, fn: Callable[..., Any], *args: Any):
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        threading.Thread(target=self._run, args=(fn, args), daemon=True).start()
+
+    def _run(self, fn: Callable[..., Any], args: Tuple) -> None:
+        try:
+            self._result = fn(*args)
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def result(self) -> Any:
+        """Wait for the call to finish and return its result, re-raising any error."""
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+class _PostCallbackError(Exception):
+    """Carries an error raised by an on_post callback past the response parsing error handler."""
+
+def _guard_callback(on_post: Callable[[Dict], None]) -> Callable[[Dict], None]:
+    """Wrap on_post so its errors can be told apart from response parsing errors."""
+    def emit(post: Dict) -> None:
+        try:
+            on_post(post)
+        except Exception as e:
+            raise _PostCallbackError() from e
+    return emit
+
+def _continuation_token(contents: List[Dict]) -> Optional[str]:
+    """Get the continuation token for the next page, if there is one."""
+    # YouTube normally appends the continuation item after the page's posts, so check
+    # the last item first and only scan the whole page if it is somewhere else
+    if contents and 'continuationItemRenderer' in contents[-1]:
+        continuation_item = contents[-1]
+    else:
         continuation_item = next(
             (item for item in contents if 'continuationItemRenderer' in item),
             None
         )
-        token = continuation_item['continuationItemRenderer']['continuationEndpoint']\
-            ['continuationCommand']['token'] if continuation_item else None
+    return continuation_item['continuationItemRenderer']['continuationEndpoint']\
+        ['continuationCommand']['token'] if continuation_item else None
+
+def _process_page(contents: List[Dict], emit: Callable[[Dict], None], limit: int,
+                  seen: Set[str], stop_at: Optional[Set[str]] = None) -> Tuple[int, bool]:
+    """Extract up to limit posts from a page, passing each to emit.
+
+    Posts whose IDs are in seen are skipped before extraction, and extracted IDs
+    are added to seen. If stop_at is given, the first post whose ID is in it
+    ends the page instead. Posts without an ID are always extracted. Returns how
+    many posts were extracted and whether a post in stop_at ended the page.
+    """
+    # Bind the extractor to a local to avoid a global + attribute lookup per post
+    extract = PostExtractor.extract_post_data
+    count = 0
+    for content in contents:
+        if 'backstagePostThreadRenderer' in content:
+            post_renderer = content['backstagePostThreadRenderer']['post']['backstagePostRenderer']
+            # Posts without an ID can't be matched, so they are always extracted
+            post_id = post_renderer.get('postId')
+            if post_id:
+                if stop_at is not None and post_id in stop_at:
+                    return count, True
+                if post_id in seen:
+                    continue
+
+            emit(extract(post_renderer))
+            count += 1
+            if post_id:
+                seen.add(post_id)
+
+            if count >= limit:
+                break
+    return count, False
+
+def _has_any_post(contents: List[Dict], post_ids: Set[str]) -> bool:
+    """Check whether any post on a page has an ID in post_ids."""
+    return any(
+        content['backstagePostThreadRenderer']['post']['backstagePostRenderer'].get('postId') in post_ids
+        for content in contents if 'backstagePostThreadRenderer' in content
+    )
+
+def load_cursor(channel_id: str) -> Dict:
+    """Load the scrape cursor saved for a channel, or an empty one if there is none."""
+    try:
+        with open(CURSOR_DIR / f'{channel_id}.json', 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return {'channel_id': channel_id, 'token': None, 'seen_post_ids': []}
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def save_cursor(channel_id: str, token: Optional[str], seen_post_ids: Set[str]) -> None:
+    """Atomically save the scrape cursor for a channel."""
+    CURSOR_DIR.mkdir(parents=True, exist_ok=True)
+    path = CURSOR_DIR / f'{channel_id}.json'
+    tmp_path = path.with_suffix('.json.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(_dumps({
+            'channel_id': channel_id,
+            'token': token,
+            'seen_post_ids': sorted(seen_post_ids)
+        }))
+    os.replace(tmp_path, path)
+
+def scrape_community_posts(channel_id: str, max_posts: int = float('inf'),
+                           on_post: Optional[Callable[[Dict], None]] = None,
+                           resume: bool = False) -> List[Dict]:
+    """Scrape community posts from a YouTube channel.
+
+    If on_post is given, each post is passed to it as soon as it is extracted
+    instead of being collected, and the returned list is empty.
+
+    If resume is set, scraping continues from the cursor saved by the previous
+    resumed run. Posts saved by earlier runs are skipped on the first page
+    fetched, and the first of them on any later page ends the scrape; posts
+    repeated within this run are only skipped. If the server rejects the saved
+    token, scraping restarts from the Community tab and walks every page,
+    skipping saved posts instead of stopping at them. The cursor is saved again
+    when scraping stops, including on errors and Ctrl-C.
+    """
+    cursor = load_cursor(channel_id) if resume else None
+    # Posts saved by earlier runs; only these can end a resumed scrape
+    saved_ids = frozenset(cursor['seen_post_ids']) if resume else frozenset()
+    # Every post saved so far, which also drops posts repeated across overlapping pages
+    seen = set(saved_ids)
+    # Token of the page being processed; None means the initial community tab page
+    page_token = cursor['token'] if resume else None
+    # Whether a post saved by an earlier run ends the scrape after the first page
+    stop_at_saved_later = resume
+
+    with YouTubeCommunityAPI() as api:
+        posts = []
+        emit = _guard_callback(on_post) if on_post else posts.append
+        count = 0
+        
+        contents = None
+        if page_token:
+            try:
+                contents = api.get_continuation_items(page_token)
+            except Exception:
+                # The saved token may have expired; older unsaved posts can then only be
+                # reached by walking the whole tab, so saved posts are skipped, not stopped at
+                page_token = None
+                stop_at_saved_later = False
+        
+        # Get initial data, unless resuming from a continuation page
+        response = None if contents is not None else api.get_initial_data(channel_id)
         
-        # Process initial posts
-        for content in contents:
-            if 'backstagePostThreadRenderer' in content:
-                post_renderer = content['backstagePostThreadRenderer']['post']['backstagePostRenderer']
-                post_data = PostExtractor.extract_post_data(post_renderer)
-                posts.append(post_data)
+        try:
+            if contents is None:
+                # Find the Community tab
+                tabs = response['contents']['twoColumnBrowseResultsRenderer']['tabs']
+                # hl is pinned to en-GB in the client context, so the title is always "Community"
+                community_tab = next(
+                    (tab['tabRenderer'] for tab in tabs
+                     if 'tabRenderer' in tab and tab['tabRenderer'].get('title') == 'Community'),
+                    None
+                )
+                
+                if not community_tab:
+                    raise Exception("Community tab not found")
                 
-                if len(posts) >= max_posts:
+                # Extract initial posts
+                contents = community_tab['content']['sectionListRenderer']['contents'][0]\
+                    ['itemSectionRenderer']['contents']
+                # Only the post list is needed from here on; let the rest of the tree be freed
+                del response, tabs, community_tab
+            
+            # Fetch the next page in the background while posts from the current one
+            # are extracted; each continuation token only becomes known once its page
+            # has arrived, so at most one request is in flight at a time
+            stop_at = None
+            while True:
+                token = _continuation_token(contents)
+
+                # Skip the prefetch when this page alone may already reach max_posts,
+                # or when it contains a previously saved post that will end the scrape
+                next_page = None
+                if token and count + len(contents) < max_posts and \
+                   not (stop_at and _has_any_post(contents, stop_at)):
+                    next_page = _Prefetch(api.get_continuation_items, token)
+
+                extracted, reached_saved = _process_page(contents, emit, max_posts - count,
+                                                         seen, stop_at)
+                count += extracted
+                if count >= max_posts:
                     return posts
 
-        # Get remaining posts using continuation token
-        while token and len(posts) < max_posts:
-            response = api.get_continuation_data(token)
-            
-            # Extract posts from continuation data
-            contents = response['onResponseReceivedEndpoints'][0]['appendContinuationItemsAction']\
-                ['continuationItems']
-            
-            # Get next continuation token
-            continuation_item = next(
-                (item for item in contents if 'continuationItemRenderer' in item),
-                None
-            )
-            token = continuation_item['continuationItemRenderer']['continuationEndpoint']\
-                ['continuationCommand']['token'] if continuation_item else None
-            
-            # Process posts
-            for content in contents:
-                if 'backstagePostThreadRenderer' in content:
-                    post_renderer = content['backstagePostThreadRenderer']['post']['backstagePostRenderer']
-                    post_data = PostExtractor.extract_post_data(post_renderer)
-                    posts.append(post_data)
-                    
-                    if len(posts) >= max_posts:
-                        return posts
+                if reached_saved or not token:
+                    # Everything older has been scraped already
+                    page_token = None
+                    break
+
+                contents = next_page.result() if next_page else api.get_continuation_items(token)
+                page_token = token
+                stop_at = saved_ids if stop_at_saved_later else None
+
+        except _PostCallbackError as e:
+            # Errors from on_post (e.g. a failed write) are re-raised unchanged
+            raise e.__cause__ from None
+
+        except Exception as e:
+            raise Exception(f"Failed to parse YouTube response: {str(e)}")
 
-    except Exception as e:
-        raise Exception(f"Failed to parse YouTube response: {str(e)}")
+        finally:
+            if resume:
+                save_cursor(channel_id, page_token, seen)
 
-    return posts
+        return posts
 
 def save_posts(posts: List[Dict], channel_id: str, output_dir: Optional[Path] = None) -> Path:
     """Save posts to a JSON file."""
     if not output_dir:
         output_dir = Path.cwd()
     
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    now = datetime.now()
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
     filename = output_dir / f'posts_{channel_id}_{timestamp}.json'
     
     data = {
         'channel_id': channel_id,
-        'scrape_date': datetime.now().isoformat(),
-        'scrape_timestamp': int(datetime.now().timestamp()),
+        'scrape_date': now.isoformat(),
+        'scrape_timestamp': int(now.timestamp()),
         'posts_count': len(posts),
         'posts': posts
     }
     
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(filename, 'wb') as f:
+        f.write(_dumps(data))
     
-    return filename 
\ No newline at end of file
+    return filename
+
+class PostWriter:
+    """Write posts to a JSON file one at a time as they are scraped."""
+
+    def __init__(self, path: Path, channel_id: str, scrape_date: datetime):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(
+            b'{\n  "channel_id": ' + _dumps(channel_id) +
+            b',\n  "scrape_date": ' + _dumps(scrape_date.isoformat()) +
+            b',\n  "scrape_timestamp": ' + _dumps(int(scrape_date.timestamp())) +
+            b',\n  "posts": [\n'
+        )
+
+    def append(self, post: Dict) -> None:
+        """Append a single post to the file."""
+        if self.count:
+            self._file.write(b',\n')
+        # Indent to match the layout save_posts produces
+        self._file.write(b'    ' + _dumps(post).replace(b'\n', b'\n    '))
+        self.count += 1
+
+    def close(self) -> None:
+        """Terminate the posts array and close the file."""
+        self._file.write(b'\n  ],\n  "posts_count": ' + _dumps(self.count) + b'\n}')
+        self._file.close()
+
+@contextmanager
+def save_posts_streaming(channel_id: str, output_dir: Optional[Path] = None) -> Iterator[PostWriter]:
+    """Open a JSON file that posts are appended to while scraping."""
+    if not output_dir:
+        output_dir = Path.cwd()
+
+    now = datetime.now()
+    timestamp = now.strftime('%Y%m%d_%H%M%S')
+    writer = PostWriter(output_dir / f'posts_{channel_id}_{timestamp}.json', channel_id, now)
+    try:
+        yield writer
+    except BaseException:
+        # Keep whatever was scraped before the failure, but don't leave empty files behind
+        writer.close()
+        if not writer.count:
+            writer.path.unlink()
+        raise
+    writer.close() 
\ No newline at end of file